@@ -11,35 +11,114 @@ It also allows us to:
 #Importing the necessary libraries:
 
 import sqlite3
+import atexit
+import matplotlib
+
+#Using the Non-Interactive Agg Backend so Plotting Needs No Display:
+
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+import numpy as np
 import csv
+import contextlib
+import sys
+import itertools
 
-#Creating the Database Structure:
+#Opening a Connection with Write-Friendly PRAGMAs:
 
-def database_struct(path_to_database):
+def _connect(path_to_database):
     
     """
-    Creates the SQLite database blueprint with the tables: Subjects, Samples,
-    TranscriptAbundance, ProteinAbundance, MetaboliteAbundance, and Annotation.
+    Opens a SQLite connection in autocommit mode (transactions are opened
+    explicitly with _transaction) and applies the PRAGMAs used for loading
+    and querying: WAL journaling, NORMAL sync, in-memory temp storage, a
+    64 MB page cache and a 256 MB memory map.
 
     Args:
         path_to_database (str): Path to the SQLite database file.
 
     Returns:
+        sqlite3.Connection: The configured connection.
+    """
+    
+    connection = sqlite3.connect(path_to_database, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA temp_store=MEMORY")
+    connection.execute("PRAGMA cache_size=-64000")
+    connection.execute("PRAGMA mmap_size=268435456")
+    return connection
+
+#Running a Block of Statements as One Explicit Transaction:
+
+@contextlib.contextmanager
+def _transaction(connection, mode='IMMEDIATE'):
+    
+    """
+    Wraps a block in BEGIN <mode> ... COMMIT, rolling back if the block or
+    the COMMIT itself raises and a transaction is still open.
+    IMMEDIATE takes the write lock up front, which suits the bulk loads.
+
+    Args:
+        connection (sqlite3.Connection): Connection opened by _connect.
+        mode (str): Transaction type, 'IMMEDIATE' or 'DEFERRED'.
+
+    Yields:
         None
     """
     
-    try: 
-    #Establishing Connection To Sqllite Server and Creating Cursor Object:
+    connection.execute(f"BEGIN {mode}")
+    try:
+        yield
+        connection.execute("COMMIT")
+    except BaseException:
+        
+        #SQLite Rolls Back by Itself on Some Errors, and a Failed COMMIT Leaves the Transaction Open
+        
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+
+#Reusing One Connection per Database Across Function Calls:
+
+_connections = {}
+
+def _get_conn(path_to_database):
     
-        connection = sqlite3.connect(path_to_database)
-        cursor = connection.cursor()
+    """
+    Returns the cached connection for a database, opening it with _connect
+    on first use so the schema and page cache survive between calls.
+
+    Args:
+        path_to_database (str): Path to the SQLite database file.
+
+    Returns:
+        sqlite3.Connection: The shared connection for that database.
+    """
     
-        print("Database Construction Has Begun")
+    if path_to_database not in _connections:
+        _connections[path_to_database] = _connect(path_to_database)
+    return _connections[path_to_database]
+
+def _close_connections():
     
-    #Using the Cursor Object to Execute SQL Commands to Create the Necessary Tables:
+    """
+    Closes every cached connection, running PRAGMA optimize on each first as
+    SQLite recommends before closing. Registered with atexit by main.
 
-        cursor.executescript("""
+    Returns:
+        None
+    """
+    
+    for connection in _connections.values():
+        connection.execute("PRAGMA optimize")
+        connection.close()
+    _connections.clear()
+
+#Table Definitions, Kept Per Table so Each Populator Can Rebuild its Own:
+
+TABLE_SCHEMAS = {
+    "Subjects": """
         CREATE TABLE Subjects(
             SubjectID TEXT PRIMARY KEY,
             Sex TEXT,
@@ -48,39 +127,44 @@ def database_struct(path_to_database):
             Race TEXT,
             SSPG REAL,
             InsulinStatus TEXT
-        );
-    
+        )
+    """,
+    "Samples": """
         CREATE TABLE Samples (
             SampleID TEXT PRIMARY KEY,
             SubjectID TEXT,
             VisitID INTEGER,
             FOREIGN KEY (SubjectID) REFERENCES Subjects(SubjectID)
-        );
-    
+        )
+    """,
+    "TranscriptAbundance": """
         CREATE TABLE TranscriptAbundance (
             SampleID TEXT,
             TranscriptID TEXT,
             Abundance REAL,
             PRIMARY KEY (SampleID, TranscriptID),
             FOREIGN KEY (SampleID) REFERENCES Samples(SampleID)
-        );
-    
+        )
+    """,
+    "ProteinAbundance": """
         CREATE TABLE ProteinAbundance(
             SampleID TEXT,
             ProteinID TEXT,
             Abundance REAL,
             PRIMARY KEY(SampleID, ProteinID),
             FOREIGN KEY (SampleID) REFERENCES Samples(SampleID)
-        );
-    
+        )
+    """,
+    "MetaboliteAbundance": """
         CREATE TABLE MetaboliteAbundance(
             SampleID TEXT,
             PeakID Text,
             Abundance REAL,
             PRIMARY KEY(SampleID, PeakID),
             FOREIGN KEY(SampleID) REFERENCES Samples(SampleID)
-        );
-    
+        )
+    """,
+    "Annotation": """
         CREATE TABLE Annotation(
             PeakID TEXT,
             Metabolite TEXT,
@@ -88,17 +172,115 @@ def database_struct(path_to_database):
             HMDB TEXT,
             Pathway TEXT,
             PRIMARY KEY(PeakID, Metabolite)
-        );
-        """)
-        
-        connection.commit()
+        )
+    """,
+}
+
+#Secondary Indexes for Each Table, Created by create_indexes After a Load:
+
+INDEX_SCHEMAS = {
+    "Subjects": [
+        "CREATE INDEX IF NOT EXISTS idx_subjects_age ON Subjects(Age)",
+        "CREATE INDEX IF NOT EXISTS idx_subjects_sex_bmi ON Subjects(Sex, BMI)",
+    ],
+    "Samples": [
+        "CREATE INDEX IF NOT EXISTS idx_samples_subjectid ON Samples(SubjectID)",
+    ],
+    "TranscriptAbundance": [
+        "CREATE INDEX IF NOT EXISTS idx_transcript_transcriptid ON TranscriptAbundance(TranscriptID, SampleID)",
+    ],
+    "ProteinAbundance": [
+        "CREATE INDEX IF NOT EXISTS idx_protein_proteinid ON ProteinAbundance(ProteinID)",
+    ],
+}
+
+def _reset_table(cursor, table_name):
+    
+    """
+    Empties a table by dropping and recreating it from TABLE_SCHEMAS, which
+    avoids the row-by-row work of DELETE FROM on an already loaded table.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on the open database connection.
+        table_name (str): Name of the table to rebuild.
+
+    Returns:
+        None
+    """
+    
+    cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+    cursor.execute(TABLE_SCHEMAS[table_name])
+
+#Creating the Database Structure:
+
+def database_struct(path_to_database):
+    
+    """
+    Creates the SQLite database blueprint with the tables: Subjects, Samples,
+    TranscriptAbundance, ProteinAbundance, MetaboliteAbundance, and Annotation.
+
+    Args:
+        path_to_database (str): Path to the SQLite database file.
+
+    Returns:
+        None
+    """
+    
+    try: 
+    #Establishing Connection To Sqllite Server and Creating Cursor Object:
+    
+        connection = _get_conn(path_to_database)
+        cursor = connection.cursor()
+    
+        print("Database Construction Has Begun")
+    
+    #Using the Cursor Object to Execute SQL Commands to Create the Necessary Tables:
+
+        cursor.executescript(";\n".join(TABLE_SCHEMAS.values()) + ";")
         
     except sqlite3.Error as e:
         print(f"SQLite error: {e}")
         
-    finally:
-        connection.close()
-        
+#Converting Numeric CSV Fields, Mapping 'NA' and Blanks to NULL:
+
+def _float_or_none(value):
+    
+    """
+    Converts a numeric CSV field to float, returning None for 'NA' or blank.
+
+    Args:
+        value (str): Raw field value from the CSV file.
+
+    Returns:
+        float or None: The parsed number, or None if the value is missing.
+    """
+    
+    return None if value in ('NA', '', None) else float(value)
+
+#Looking Up the Positions of Required Columns in a CSV Header:
+
+def _column_positions(header, columns, path_to_file):
+    
+    """
+    Returns the index of each required column in a CSV header row.
+
+    Args:
+        header (list): Header row as returned by csv.reader.
+        columns (tuple): Names of the columns the loader needs.
+        path_to_file (str): Path to the file, used in the error message.
+
+    Returns:
+        list: Position of each column, in the order given.
+
+    Raises:
+        ValueError: If any required column is missing from the header.
+    """
+    
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f"{path_to_file} is missing required column(s): {', '.join(missing)}")
+    return [header.index(column) for column in columns]
+
 #Parsing the Subjects File and Populating the Subjects Table:
     
 def subject_table_populator(path_to_file, path_to_database):
@@ -114,35 +296,48 @@ def subject_table_populator(path_to_file, path_to_database):
         None
     """
     
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
-    cursor.execute("DELETE FROM Subjects")
     
-    with open(path_to_file, 'r', encoding='utf-8-sig') as file:
-        reader = csv.DictReader(file)
+    #Running the Whole Load as One Transaction so Rows Share a Single Commit
+    
+    with _transaction(connection):
+        _reset_table(cursor, "Subjects")
+    
+        with open(path_to_file, 'r', encoding='utf-8-sig') as file:
+            reader = csv.reader(file)
+            
+            #Reading the Header Once and Looking Up Each Column's Position
+            
+            header = next(reader)
+            (idx_subject, idx_sex, idx_age, idx_bmi, idx_race, idx_sspg, idx_status) = _column_positions(
+                header,
+                ('SubjectID', 'Sex', 'Age', 'BMI', 'Race', 'SSPG', 'IR_IS_classification'),
+                path_to_file
+            )
         
-        # Iterating over the rows and inserting records into the database
+            # Streaming the rows into a single executemany without building a list first
+            #Null Value Handling and Numeric Conversion so Queries Compare Numbers, Not Strings
         
-        for row in reader:
-            
-            #Null Value Handling because of Errors in Running Queries
-            age = None if row['Age'] in ('NA','') else row['Age']
+            records = (
+                (
+                    row[idx_subject], 
+                    row[idx_sex], 
+                    _float_or_none(row[idx_age]), 
+                    _float_or_none(row[idx_bmi]), 
+                    row[idx_race], 
+                    _float_or_none(row[idx_sspg]), 
+                    row[idx_status]
+                )
+                for row in reader
+                if row
+            )
             
-            cursor.execute('''
+            cursor.executemany('''
                 INSERT INTO Subjects(SubjectID, Sex, Age, BMI, Race, SSPG, InsulinStatus)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                row['SubjectID'], 
-                row['Sex'], 
-                row['Age'], 
-                row['BMI'], 
-                row['Race'], 
-                row['SSPG'], 
-                row['IR_IS_classification']
-            ))
-            
-    connection.commit()
-    connection.close()
+            ''', records)
+
     print("Subjects table populated successfully.")
             
 #Extracting the Visit ID and Using it to Create a Samples Table:
@@ -161,39 +356,82 @@ def sample_table_populator(path_to_file, path_to_database):
         None
     """
     
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
-    cursor.execute("DELETE FROM Samples")
     
-    #Iterating Over the File and Populating the Table
+    #Running the Whole Load as One Transaction so Rows Share a Single Commit
     
-    with open(path_to_file, 'r', encoding='utf-8-sig') as file:
+    with _transaction(connection):
+        _reset_table(cursor, "Samples")
+    
+        #Iterating Over the File and Populating the Table
+    
+        with open(path_to_file, 'r', encoding='utf-8-sig') as file:
         
-        reader = csv.DictReader(file, delimiter = '\t')
-        reader.fieldnames = [header.strip() for header in reader.fieldnames]
+            reader = csv.reader(file, delimiter = '\t')
+            header = [column.strip() for column in next(reader)]
+            idx_sample, = _column_positions(header, ('SampleID',), path_to_file)
         
-        for row in reader:
-            try:
+            for row in reader:
                 
-                sample_id = row['SampleID']
+                #Skipping Blank Lines, as DictReader Did
                 
-                #Splitting the SampleID column into Subject ID and Visit ID and Inserting into Table
+                if not row:
+                    continue
+                try:
                 
-                subject_id, visit_id = sample_id.split('-')
-                cursor.execute('''
-                    INSERT OR IGNORE INTO Samples(SampleID, SubjectID, VisitID)
-                    VALUES(?, ?, ?)
-                ''', (sample_id, subject_id, visit_id))
+                    sample_id = row[idx_sample]
                 
-            except KeyError:
+                    #Splitting the SampleID column into Subject ID and Visit ID and Inserting into Table
                 
-                print(f"SampleID not found: {row}")
-                continue
-                    
-    connection.commit()
-    connection.close()
+                    subject_id, visit_id = sample_id.split('-')
+                    cursor.execute('''
+                        INSERT OR IGNORE INTO Samples(SampleID, SubjectID, VisitID)
+                        VALUES(?, ?, ?)
+                    ''', (sample_id, subject_id, visit_id))
+                
+                except IndexError:
+                
+                    print(f"SampleID not found: {row}")
+                    continue
+
     print("Samples table populated successfully.")
     
+#Reading a Wide Abundance File as (SampleID, Feature, Abundance) Tuples:
+
+def _abundance_records(path_to_file):
+    
+    """
+    Yields one (SampleID, feature ID, abundance) tuple per cell of a wide
+    abundance TSV whose first column is SampleID and whose other headers are
+    feature IDs, streaming the file one row at a time with csv.reader. 'NA'
+    and blank cells are yielded as None so they are stored as NULL, matching
+    the Subjects loader.
+
+    Args:
+        path_to_file (str): Path to the abundance TSV file.
+
+    Yields:
+        tuple: (SampleID, feature ID, abundance) for every cell.
+    """
+    
+    with open(path_to_file, 'r') as file:
+        reader = csv.reader(file, delimiter = '\t')
+        
+        #SampleID is the First Column, Every Other Header is a Feature ID
+        
+        header = next(reader)
+        feature_ids = header[1:]
+        
+        for row in reader:
+            
+            #Skipping Blank Lines, as DictReader Did
+            
+            if not row:
+                continue
+            abundances = [None if value in ('NA', '') else value for value in row[1:]]
+            yield from zip(itertools.repeat(row[0]), feature_ids, abundances)
+    
 #Parsing the Transcriptome Abundance File and Populating the Table:
 
 def transcriptome_populator(path_to_file, path_to_database):
@@ -209,27 +447,21 @@ def transcriptome_populator(path_to_file, path_to_database):
         None
     """
     
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
-    cursor.execute("DELETE FROM TranscriptAbundance")
     
-    #Iterating Over the File and Populating the Table
+    #Running the Whole Load as One Transaction so Rows Share a Single Commit
     
-    with open(path_to_file, 'r') as file:
-        reader = csv.DictReader(file, delimiter = '\t')
-        for row in reader:
-            
-            #Popping the Sample_ID so That Only Transcriptome Data is Stored
-            
-            sample_id = row.pop('SampleID')
-            for transcript_id, abundance in row.items():
-                cursor.execute('''
-                    INSERT INTO TranscriptAbundance (SampleID, TranscriptID, Abundance)
-                    VALUES (?, ?, ?)
-                ''', (sample_id, transcript_id, abundance))
-                
-    connection.commit()
-    connection.close()
+    with _transaction(connection):
+        _reset_table(cursor, "TranscriptAbundance")
+    
+        #Streaming One (SampleID, TranscriptID, Abundance) Tuple per Cell into executemany
+    
+        cursor.executemany('''
+            INSERT INTO TranscriptAbundance (SampleID, TranscriptID, Abundance)
+            VALUES (?, ?, ?)
+        ''', _abundance_records(path_to_file))
+
     print("Transcript Abundance Table Populated Successfully.")
     
 #Parsing the Protein Abundance File and Populating the Table:
@@ -247,27 +479,21 @@ def protein_populator(path_to_file, path_to_database):
         None
     """
 
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
-    cursor.execute("DELETE FROM ProteinAbundance")
     
-    #Iterating Over the File and Populating the Table
+    #Running the Whole Load as One Transaction so Rows Share a Single Commit
     
-    with open(path_to_file, 'r') as file:
-        reader = csv.DictReader(file, delimiter = '\t')
-        for row in reader:
-            
-            #Popping the Sample_ID so That Only Protein Data is Stored
-            
-            sample_id = row.pop('SampleID')
-            for protein_id, abundance in row.items():
-                cursor.execute('''
-                    INSERT INTO ProteinAbundance (SampleID, ProteinID, Abundance)
-                    VALUES (?, ?, ?)
-                ''', (sample_id, protein_id, abundance))
-                
-    connection.commit()
-    connection.close()
+    with _transaction(connection):
+        _reset_table(cursor, "ProteinAbundance")
+    
+        #Streaming One (SampleID, ProteinID, Abundance) Tuple per Cell into executemany
+    
+        cursor.executemany('''
+            INSERT INTO ProteinAbundance (SampleID, ProteinID, Abundance)
+            VALUES (?, ?, ?)
+        ''', _abundance_records(path_to_file))
+
     print("Protein Abundance Table Populated Successfully.")
     
 #Parsing the Metabolite Abundance File and Populating the Table:
@@ -285,27 +511,21 @@ def Metabolite_populator(path_to_file, path_to_database):
         None
     """
     
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
-    cursor.execute("DELETE FROM MetaboliteAbundance")
     
-    #Iterating Over the File and Populating the Table
+    #Running the Whole Load as One Transaction so Rows Share a Single Commit
     
-    with open(path_to_file, 'r') as file:
-        reader = csv.DictReader(file, delimiter = '\t')
-        for row in reader:
-            
-            #Popping the Sample_ID so That Only Metabolite Data is Stored
-            
-            sample_id = row.pop('SampleID')
-            for peak_id, abundance in row.items():
-                cursor.execute('''
-                    INSERT INTO MetaboliteAbundance (SampleID, PeakID, Abundance)
-                    VALUES (?, ?, ?)
-                ''', (sample_id, peak_id, abundance))
-                
-    connection.commit()
-    connection.close()
+    with _transaction(connection):
+        _reset_table(cursor, "MetaboliteAbundance")
+    
+        #Streaming One (SampleID, PeakID, Abundance) Tuple per Cell into executemany
+    
+        cursor.executemany('''
+            INSERT INTO MetaboliteAbundance (SampleID, PeakID, Abundance)
+            VALUES (?, ?, ?)
+        ''', _abundance_records(path_to_file))
+
     print("Metabolite Table Populated Successfully.")
     
 #Parsing the Annotations File and Populating the Table:
@@ -323,36 +543,132 @@ def Annotations_populator(path_to_file, path_to_database):
         None
     """
     
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
-    cursor.execute("DELETE FROM Annotation")
     
-    #Iterating Over the File and Populating the Table
+    #Running the Whole Load as One Transaction so Rows Share a Single Commit
     
-    with open(path_to_file, 'r') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            cursor.execute('''
+    with _transaction(connection):
+        _reset_table(cursor, "Annotation")
+    
+        #Iterating Over the File and Populating the Table
+    
+        with open(path_to_file, 'r') as file:
+            reader = csv.reader(file)
+            header = next(reader)
+            idx_peak, idx_metabolite, idx_kegg, idx_hmdb, idx_pathway = _column_positions(
+                header,
+                ('PeakID', 'Metabolite', 'KEGG', 'HMDB', 'Pathway'),
+                path_to_file
+            )
+            
+            records = (
+                (row[idx_peak], row[idx_metabolite], row[idx_kegg], row[idx_hmdb], row[idx_pathway])
+                for row in reader
+                if row
+            )
+            cursor.executemany('''
                 INSERT INTO Annotation (PeakID, Metabolite, KEGG, HMDB, Pathway)
                 VALUES (?, ?, ?, ?, ?)
-            ''', (row['PeakID'], row['Metabolite'], row['KEGG'], row['HMDB'], row['Pathway']))
-            
-    connection.commit()
-    connection.close()
+            ''', records)
+
     print("Metabolite Annotation Table Populated successfully.")
     
+#Creating Secondary Indexes Once the Tables are Loaded:
+
+def create_indexes(path_to_database):
+    
+    """
+    Creates the secondary indexes used by the query joins and filters. Run
+    after the bulk load so rows are not indexed one insert at a time. Tables
+    that do not exist yet (e.g. never created or loaded) are skipped.
+    Annotation needs no extra index as its primary key already leads with PeakID.
+
+    Args:
+        path_to_database (str): Path to the SQLite database file.
+
+    Returns:
+        None
+    """
+    
+    try:
+        connection = _get_conn(path_to_database)
+        cursor = connection.cursor()
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        existing_tables = {name for (name,) in cursor.fetchall()}
+        
+        #Indexing Only the Tables That Exist, so a Partial --loaddb on a Fresh Database Works
+        
+        with _transaction(connection):
+            for table_name, statements in INDEX_SCHEMAS.items():
+                if table_name in existing_tables:
+                    for statement in statements:
+                        cursor.execute(statement)
+        
+        print("Indexes created successfully.")
+        
+    except sqlite3.Error as e:
+        print(f"SQLite error: {e}")
+    
+#Refreshing the Planner Statistics After a Load:
+
+def update_statistics(path_to_database):
+    
+    """
+    Runs ANALYZE so sqlite_stat1 reflects the freshly loaded tables and the
+    query planner can choose between index probes and scans by row counts.
+
+    Args:
+        path_to_database (str): Path to the SQLite database file.
+
+    Returns:
+        None
+    """
+    
+    connection = _get_conn(path_to_database)
+    connection.execute("ANALYZE")
+    print("Database statistics updated successfully.")
+    
+#Streaming Large Query Results in Batches:
+
+def _stream_rows(cursor, empty_message, arraysize=10000):
+    
+    """
+    Yields the rows of an executed query, fetching arraysize rows at a time
+    with fetchmany, then closes the cursor. Prints empty_message if the query
+    returned no rows.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor holding an executed SELECT.
+        empty_message (str): Message printed when there are no rows.
+        arraysize (int): Number of rows fetched per batch.
+
+    Yields:
+        tuple: One result row at a time.
+    """
+    
+    cursor.arraysize = arraysize
+    found = False
+    
+    with contextlib.closing(cursor):
+        for rows in iter(cursor.fetchmany, []):
+            found = True
+            yield from rows
+    
+    if not found:
+        print(empty_message)
+
 #Query 1- Retrieve SubjectID and Age of subjects whose age is greater than 70:
 
 def subjects_over_70(path_to_database):
     
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
     
     cursor.execute("SELECT SubjectID, Age FROM Subjects WHERE Age > 70")
     answer = cursor.fetchall()
     
-    connection.close()
-    
     if answer:
         return answer
     else:
@@ -363,7 +679,7 @@ def subjects_over_70(path_to_database):
 
 def females_with_healthy_BMI(path_to_database):
     
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
     
     cursor.execute("""
@@ -371,21 +687,16 @@ def females_with_healthy_BMI(path_to_database):
         WHERE Sex = 'F' and BMI BETWEEN 18.5 and 24.9
         ORDER BY SubjectID DESC
         """)
-    answer = cursor.fetchall()
     
-    connection.close()
+    #Streaming the Rows Rather Than Materialising Them with fetchall
     
-    if answer:
-        return answer
-    else:
-        print("No Females with Healthy BMI.")
-        return []
+    return _stream_rows(cursor, "No Females with Healthy BMI.")
     
 #Query 3- Retrieve the Visit IDs of Subject 'ZNQOVZV'. 
 
 def visits_by_ZNQOVZV(path_to_database):
     
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
     
     cursor.execute("""
@@ -394,15 +705,14 @@ def visits_by_ZNQOVZV(path_to_database):
         WHERE SubjectID = 'ZNQOVZV';
     """)
     answer = cursor.fetchall()
-    
-    connection.close()
+
     return answer
 
 #Query 4- Retrieve distinct SubjectIDs who have metabolomics samples and are insulin-resistant.
 
 def subjects_metabolomic_insulin_resistant(path_to_database):
     
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
     
     cursor.execute("""
@@ -413,8 +723,6 @@ def subjects_metabolomic_insulin_resistant(path_to_database):
     """)
     answer = cursor.fetchall()
     
-    connection.close()
-    
     if answer:
         return answer
     else:
@@ -423,23 +731,31 @@ def subjects_metabolomic_insulin_resistant(path_to_database):
     
 #Query 5- Retrieve the unique KEGG IDs that have been annotated for the following peaks: 'nHILIC_121.0505_3.5', 'nHILIC_130.0872_6.3', 'nHILIC_133.0506_2.3', 'nHILIC_133.0506_4.4'.
 
-def KEGG_id_retriever(path_to_database):
+KEGG_PEAK_IDS = (
+    'nHILIC_121.0505_3.5',
+    'nHILIC_130.0872_6.3',
+    'nHILIC_133.0506_2.3',
+    'nHILIC_133.0506_4.4',
+)
+
+def KEGG_id_retriever(path_to_database, peak_ids=KEGG_PEAK_IDS):
     
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
     
-    cursor.execute("""
-        SELECT DISTINCT KEGG FROM Annotation
-        WHERE PeakID IN (
-            'nHILIC_121.0505_3.5',
-            'nHILIC_130.0872_6.3',
-            'nHILIC_133.0506_2.3',
-            'nHILIC_133.0506_4.4'
-        )
-    """)
-    answer = cursor.fetchall()
+    #Loading the Peaks into a Temp Table and Joining, so Any Number of Peaks Uses the PeakID Index
     
-    connection.close()
+    with _transaction(connection, 'DEFERRED'):
+        cursor.execute("DROP TABLE IF EXISTS temp.Probes")
+        cursor.execute("CREATE TEMP TABLE Probes(PeakID TEXT PRIMARY KEY)")
+        cursor.executemany("INSERT OR IGNORE INTO Probes VALUES (?)", ((peak_id,) for peak_id in peak_ids))
+        cursor.execute("""
+            SELECT DISTINCT A.KEGG
+            FROM Annotation AS A
+            JOIN Probes AS P USING (PeakID)
+        """)
+        answer = cursor.fetchall()
+        cursor.execute("DROP TABLE temp.Probes")
     
     if answer:
         return answer
@@ -450,7 +766,7 @@ def KEGG_id_retriever(path_to_database):
 #Query 6- Retrieve the minimum, maximum and average age of Subjects.
 
 def statistical_data_on_age(path_to_database):
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
     
     try:
@@ -460,7 +776,7 @@ def statistical_data_on_age(path_to_database):
                 MAX(Age) AS MaxAge, 
                 AVG(Age) AS AvgAge
             FROM Subjects
-            WHERE Age IS NOT NULL AND Age != 'NA';
+            WHERE Age IS NOT NULL;
         """)
         
         answer = cursor.fetchone()  
@@ -468,9 +784,6 @@ def statistical_data_on_age(path_to_database):
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     
-    finally:
-        connection.close()
-    
     # Handling Null values
     if not answer or all(value is None for value in answer):
         print("No valid data found.")  
@@ -483,7 +796,7 @@ def statistical_data_on_age(path_to_database):
 
 def pathway_annotation_counter(path_to_database):
     
-    connection = sqlite3.connect(path_to_database)
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
     
     cursor.execute("""
@@ -493,46 +806,48 @@ def pathway_annotation_counter(path_to_database):
         HAVING AnnotationCount >= 10
         ORDER BY AnnotationCount DESC
     """)
-    answer = cursor.fetchall()
     
-    connection.close()
+    #Streaming the Rows Rather Than Materialising Them with fetchall
     
-    if answer:
-        return answer
-    else:
-        print("No pathways with at least 10 annotations found.")
-        return []
+    return _stream_rows(cursor, "No pathways with at least 10 annotations found.")
 
 #Query 8- Retrieve the maximum abundance of the transcript 'A1BG' for subject 'ZOZOW1T' across all samples.
 
-def max_A1BG_abundance(path_to_database):
-    connection = sqlite3.connect(path_to_database)
+def max_A1BG_abundance(path_to_database, transcript_id='A1BG', subject_id='ZOZOW1T'):
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
     
+    #Joining Through Samples so the Planner Can Probe the (TranscriptID, SampleID) Index
+    
     cursor.execute("""
-        SELECT MAX(Abundance)
-        FROM TranscriptAbundance
-        WHERE TranscriptID = 'A1BG' 
-        AND SampleID IN (
-            SELECT SampleID 
-            FROM Samples 
-            WHERE SubjectID = 'ZOZOW1T'
-        )
-    """)
+        SELECT MAX(TA.Abundance)
+        FROM TranscriptAbundance AS TA
+        JOIN Samples AS S ON TA.SampleID = S.SampleID
+        WHERE TA.TranscriptID = ? AND S.SubjectID = ?
+    """, (transcript_id, subject_id))
     answer = cursor.fetchone()
-    connection.close()
 
     if answer and answer[0] is not None:
         return answer[0]
     else:
-        print("No data found for A1BG abundance for Subject 'ZOZOW1T'.")
+        print(f"No data found for {transcript_id} abundance for Subject '{subject_id}'.")
         return None
 
 #Query 9- Retrieve the subjects’ age and BMI.
 
-def age_bmi_plot(path_to_database):
+def fetch_age_bmi(path_to_database):
     
-    connection = sqlite3.connect(path_to_database)
+    """
+    Retrieves the Age and BMI of every subject that has both recorded.
+
+    Args:
+        path_to_database (str): Path to the SQLite database file.
+
+    Returns:
+        numpy.ndarray: Float array of shape (n, 2) holding (Age, BMI) rows.
+    """
+    
+    connection = _get_conn(path_to_database)
     cursor = connection.cursor()
     
     cursor.execute("""
@@ -540,34 +855,37 @@ def age_bmi_plot(path_to_database):
         FROM Subjects
         WHERE Age IS NOT NULL AND BMI IS NOT NULL
     """)
-    data = cursor.fetchall()
     
-    connection.close()
-    
-    # Debugging output
-    print(f"Retrieved data: {data}")
-    
-    # Ensure all values are numeric and filter out invalid rows
-    numeric_data = [(float(age), float(bmi)) for age, bmi in data if isinstance(age, (int, float)) and isinstance(bmi, (int, float))]
+    # Casting the rows straight from the cursor into an (n, 2) float array;
+    # the SQL already drops NULLs, and a non-numeric value raises ValueError
+    return np.fromiter(cursor, dtype=np.dtype((np.float64, 2)))
+
+#Plotting the Age vs BMI Data Retrieved by Query 9:
+
+def plot_age_bmi(arr, outpath="age_vs_bmi_scatterplot.png"):
     
-    # Separate ages and bmis
-    if numeric_data:
-        ages, bmis = zip(*numeric_data)  
-    else:
-        ages, bmis = [], []
+    """
+    Saves an Age vs BMI scatter plot of the array returned by fetch_age_bmi.
+
+    Args:
+        arr (numpy.ndarray): Array of (Age, BMI) rows.
+        outpath (str): Path of the image file to write.
+
+    Returns:
+        None
+    """
     
-    # Plot the data
-    if ages and bmis:
-        plt.scatter(ages, bmis)
+    if arr.size:
+        plt.figure()
+        plt.scatter(arr[:, 0], arr[:, 1])
         plt.xlabel("Age")
         plt.ylabel("BMI")
         plt.title("Age vs BMI Plot")
-        plt.savefig("age_vs_bmi_scatterplot.png")
-        print("Plot saved as 'age_vs_bmi_scatterplot.png'")
+        plt.savefig(outpath)
+        plt.close()
+        print(f"Plot saved as '{outpath}'")
     else:
         print("No valid Age and BMI data to plot.")
-    
-    return data
 
 """
 Command-Line:
@@ -608,6 +926,10 @@ def main():
     parser.add_argument("--annotations", type=str, help="Path to Metabolome Annotation CSV file.")
     args = parser.parse_args()
     
+    #Closing the Shared Database Connection Once, When the Script Exits:
+    
+    atexit.register(_close_connections)
+    
     #Using if Statements to Match Specific User Input to Code Function:
     if args.createdb:
         print("Creating Database Structure")
@@ -627,34 +949,26 @@ def main():
             Metabolite_populator(args.metabolome, args.database)
         if args.annotations:
             Annotations_populator(args.annotations, args.database)
+        create_indexes(args.database)
+        update_statistics(args.database)
         print("All data loaded successfully.")
         
-    #Using if Statements to Match Specific User Input to the respective Query:
+    #Queries Whose Rows are Written Straight to Stdout as Tab-Separated Lines:
+    
+    row_queries = {
+        1: subjects_over_70,
+        2: females_with_healthy_BMI,
+        3: visits_by_ZNQOVZV,
+        4: subjects_metabolomic_insulin_resistant,
+        5: KEGG_id_retriever,
+        7: pathway_annotation_counter,
+    }
+    
+    #Dispatching Specific User Input to the respective Query:
     if args.querydb:
-        if args.querydb == 1:
-            answer = subjects_over_70(args.database)
-            for row in answer:
-                print("\t".join(map(str,row)))
-                
-        elif args.querydb == 2:
-            answer = females_with_healthy_BMI(args.database)
-            for row in answer:
-                print("\t".join(map(str,row)))
-                
-        elif args.querydb == 3:
-            answer = visits_by_ZNQOVZV(args.database)
-            for row in answer:
-                print("\t".join(map(str,row)))
-                
-        elif args.querydb == 4:
-            answer = subjects_metabolomic_insulin_resistant(args.database)
-            for row in answer:
-                print("\t".join(map(str,row)))
-                
-        elif args.querydb == 5:
-            answer = KEGG_id_retriever(args.database)
-            for row in answer:
-                print("\t".join(map(str,row)))
+        if args.querydb in row_queries:
+            answer = row_queries[args.querydb](args.database)
+            csv.writer(sys.stdout, delimiter='\t', lineterminator='\n').writerows(answer)
                 
         elif args.querydb == 6:
             answer = statistical_data_on_age(args.database)
@@ -667,18 +981,14 @@ def main():
                 print("No valid age data")
             
                 
-        elif args.querydb == 7:
-            answer = pathway_annotation_counter(args.database)
-            for row in answer:
-                print("\t".join(map(str,row)))
-                
         elif args.querydb == 8:
             answer = max_A1BG_abundance(args.database)
             print(f"Maximum Abundance of A1BG: {answer}")
             
         elif args.querydb == 9:
-            answer = age_bmi_plot(args.database)
-            if answer:
+            answer = fetch_age_bmi(args.database)
+            plot_age_bmi(answer, "age_vs_bmi_scatterplot.png")
+            if answer.size:
                 print("Age vs BMI data successfully retrieved and plotted.")
             else:
                 print("No valid Age and BMI data available to plot.")